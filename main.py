@@ -4,10 +4,28 @@ import serial
 import threading
 import time
 import keyboard
+from sbus_protocol import frame_airtime
+from sbus_transmitter import SBUSTransmitter
+from sbus_tx_process import TxProcess
+from sbus_mapping import InputMapper, DEFAULT_MAPPING_FILE
+from sbus_udp_input import UDPChannelInput, DEFAULT_HOST, DEFAULT_PORT
 
 # COM5の部分を使用するポートに合わせて変更
 SERIAL_PORT = 'com7'
 BAUDRATE = 115200
+TX_PERIOD = 0.01  # 送信周期[s]
+MAPPING_FILE = DEFAULT_MAPPING_FILE  # キー割り当て・ミキシングの設定ファイル
+
+# 送信ループを別プロセスで実行（GUIの処理で送信周期が乱れない）
+TX_PROCESS = False
+TX_CPU = None         # 送信プロセスを固定するCPU番号（None: 固定しない）
+TX_REALTIME = False   # 送信プロセスの優先度を上げる（権限がある場合のみ有効）
+
+# UDPでチャンネル値を受け取る（地上局・シミュレーター連携）。有効時はキーボード入力を使わない
+UDP_ENABLED = False
+UDP_HOST = DEFAULT_HOST
+UDP_PORT = DEFAULT_PORT
+UDP_TIMEOUT = 0.2  # この時間受信がなければ sbus_mapping.json の failsafe 値にする[s]
 
 class SBUSControllerMonitorApp:
     def __init__(self, root):
@@ -19,29 +37,26 @@ class SBUSControllerMonitorApp:
         self.serial_port = SERIAL_PORT
         self.baudrate = BAUDRATE
         self.ser = None
+        self.tx = None
+        self.tx_proc = None
+        self.push_lock = threading.Lock()  # UDP受信スレッドとメインループが送信プロセスに書く順序を保つ
         self.running = True
         
-        # コントローラーデータ
-        self.control = [1000] * 16
-        # スイッチ系チャンネル（CH5, CH7-CH16）を初期値500に設定（switch_states=1 に対応）
-        self.control[4] = 500   # CH5
-        for i in range(6, 16):  # CH7-CH16
-            self.control[i] = 500
+        # コントローラーデータ（キー割り当て・初期値は設定ファイルから）
+        self.mapper = InputMapper.load(MAPPING_FILE)
+        self.control = self.mapper.initial_values()
         self.data = [0] * 25
-        self.switch_states = [1] * 11  # [0]=CH5, [1..6]=CH7-CH12, [7..10]=CH13-CH16
-        self._toggle_key_pressed = set()
+        
+        self.udp = None
+        if UDP_ENABLED:
+            # 送信プロセスを使う場合は、受信スレッドから直接送信プロセスに値を渡す
+            # （GUIのメインループの周期を待たない）
+            self.udp = UDPChannelInput(UDP_HOST, UDP_PORT, timeout=UDP_TIMEOUT,
+                                       on_packet=self.push_channels if TX_PROCESS else None)
+            self.udp.start()
         
         # チャンネル名
-        self.channel_names = [
-            "CH1  エルロン（左）",    "CH2  ラダー",
-            "CH3  スロットル",       "CH4  エレベーター",
-            "CH5  投下装置 (Key:0)",  "CH6  エルロン（右）",
-            "CH7  自動操縦 (Key:1)",  "CH8  ミッション選択 (Key:2)",
-            "CH9  自動離着陸 (Key:3)", "CH10 安全装置 (Key:4)",
-            "CH11 離陸前テスト (Key:5)", "CH12 離陸後テスト (Key:6)",
-            "CH13 (Key:7)",            "CH14 (Key:8)",
-            "CH15 (Key:9)",            "CH16 (Key:-)"
-        ]
+        self.channel_names = [self.mapper.channel_label(i) for i in range(16)]
         
         # GUI要素の初期化
         self.create_widgets()
@@ -53,8 +68,9 @@ class SBUSControllerMonitorApp:
         self.serial_thread = threading.Thread(target=self.main_loop, daemon=True)
         self.serial_thread.start()
         
-        self.keyboard_thread = threading.Thread(target=self.check_keyboard, daemon=True)
-        self.keyboard_thread.start()
+        if not self.udp:
+            self.keyboard_thread = threading.Thread(target=self.check_keyboard, daemon=True)
+            self.keyboard_thread.start()
         
         self.serial_receive_thread = threading.Thread(target=self.serial_receive_loop, daemon=True)
         self.serial_receive_thread.start()
@@ -73,6 +89,11 @@ class SBUSControllerMonitorApp:
         status_label = ttk.Label(self.root, textvariable=self.status_var, font=("Arial", 10))
         status_label.pack(pady=(0, 4))
         
+        # 送信統計表示
+        self.tx_stats_var = tk.StringVar(value="")
+        tx_stats_label = ttk.Label(self.root, textvariable=self.tx_stats_var, font=("Arial", 9))
+        tx_stats_label.pack(pady=(0, 4))
+        
         # 左右分割ペイン
         paned = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
         paned.pack(fill=tk.BOTH, expand=True, padx=8, pady=4)
@@ -178,37 +199,7 @@ class SBUSControllerMonitorApp:
     
     def create_guide_tab(self, parent):
         """操作ガイドタブ"""
-        guide_text = """
-操作ガイド
-━━━━━━━━━━━━━━━━━━━━━━━━━━
-
-【プロポスティック操作】
-  エルロン（左） (CH1) : A / D キー
-  ラダー     (CH2) : J / L キー
-  スロットル (CH3) : W / S キー
-  エレベーター (CH4) : I / K キー
-
-【切り替え操作】
-  投下装置   (CH5)  : 0 キー (3段階: 500/1000/1500)
-  エルロン（右） (CH6)  : Q / E キー
-
-【3段階切り替え】
-  自動操縦     (CH7)  : 1 キー (500/1000/1500)
-  ミッション選択   (CH8)  : 2 キー (500/1000/1500)
-  自動離着陸   (CH9)  : 3 キー (500/1000/1500)
-  安全装置     (CH10) : 4 キー (500/1000/1500)
-  離陸前テスト (CH11) : 5 キー (500/1000/1500)
-  離陸後テスト (CH12) : 6 キー (500/1000/1500)
-  （未割り当）  (CH13) : 7 キー (500/1000/1500)
-  （未割り当）  (CH14) : 8 キー (500/1000/1500)
-  （未割り当）  (CH15) : 9 キー (500/1000/1500)
-  （未割り当）  (CH16) : - キー (500/1000/1500)
-
-【その他】
-  リセット      : R キー (すべてニュートラル)
-
-各プログレスバーはリアルタイムで値を表示します。
-        """
+        guide_text = self.mapper.guide_text()
         
         text_widget = tk.Text(parent, wrap=tk.WORD, font=("Courier", 10))
         text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -224,14 +215,29 @@ class SBUSControllerMonitorApp:
         self.create_guide_tab(popup)
     
     def connect_serial(self):
+        if TX_PROCESS:
+            # ポートは送信プロセス側で開く
+            self.tx_proc = TxProcess(self.serial_port, self.baudrate, serial.PARITY_NONE, 1,
+                                     period=TX_PERIOD, cpu=TX_CPU, realtime=TX_REALTIME)
+            # 初期値は入力ではないので時刻を付けない（起動時間が遅延に入らないようにする）
+            self.tx_proc.update(self.output_channels())
+            self.tx_proc.start()
+            self.status_var.set(f"Status: Connected to {self.serial_port} (TX process)")
+            return
         try:
             self.ser = serial.Serial(self.serial_port, self.baudrate, 
-                                    parity=serial.PARITY_NONE, stopbits=1, timeout=1)
+                                    parity=serial.PARITY_NONE, stopbits=1, timeout=1,
+                                    write_timeout=2 * frame_airtime(self.baudrate, 8, serial.PARITY_NONE, 1))
             self.status_var.set(f"Status: Connected to {self.serial_port}")
+            self.tx = SBUSTransmitter(self.ser, period=TX_PERIOD)
         except Exception as e:
             self.status_var.set(f"Status: Error - {str(e)}")
     
     def disconnect_serial(self):
+        if self.tx_proc:
+            self.tx_proc.stop()
+            self.tx_proc = None
+            self.status_var.set("Status: Disconnected")
         if self.ser and self.ser.is_open:
             self.ser.close()
             self.status_var.set("Status: Disconnected")
@@ -242,9 +248,23 @@ class SBUSControllerMonitorApp:
     def clear_text_log(self):
         self.monitor_text.delete(1.0, tk.END)
     
+    def push_channels(self):
+        """UDP入力を反映して送信プロセスに値を渡す（UDP受信スレッドとメインループから呼ばれる）"""
+        tx_proc = self.tx_proc
+        if not tx_proc:
+            return
+        with self.push_lock:
+            # 取り込みと書き込みをまとめて行い、古い値（フェイルセーフ判定）が新しい値を上書きしないようにする
+            stamp = self.udp.apply(self.control) if self.udp else None
+            tx_proc.update(self.output_channels(), stamp)
+    
+    def output_channels(self):
+        """送信する値（UDP入力が途絶えている間は failsafe の値）"""
+        return self.mapper.output(self.control, self.udp is not None and not self.udp.active)
+    
     def convert_data(self):
         """SBUSデータに変換 - 16チャンネル対応"""
-        channels = self.control  # 16チャンネルすべてを使用
+        channels = self.output_channels()  # 16チャンネルすべてを使用（ミキシング後）
         
         self.data[0] = 0x0F  # ヘッダー
         
@@ -278,65 +298,10 @@ class SBUSControllerMonitorApp:
     
     def check_keyboard(self):
         """キーボード入力チェック"""
-        # トグルキーマッピング: {key: (switch_statesインデックス, controlインデックス)}
-        toggle_map = {
-            '0': (0, 4),
-            '1': (1, 6),  '2': (2, 7),  '3': (3, 8),  '4': (4, 9),
-            '5': (5, 10), '6': (6, 11), '7': (7, 12), '8': (8, 13),
-            '9': (9, 14), '-': (10, 15),
-        }
-
         while self.running:
             try:
-                # アナログチャンネル（ポーリング）
-                step = 10
-                if keyboard.is_pressed('j'):
-                    if self.control[0] < 1680: self.control[0] += step
-                elif keyboard.is_pressed('l'):
-                    if self.control[0] > 360: self.control[0] -= step
-
-                if keyboard.is_pressed('a'):
-                    if self.control[1] < 1680: self.control[1] += step
-                elif keyboard.is_pressed('d'):
-                    if self.control[1] > 360: self.control[1] -= step
-
-                if keyboard.is_pressed('w'):
-                    if self.control[2] < 1680: self.control[2] += step
-                elif keyboard.is_pressed('s'):
-                    if self.control[2] > 360: self.control[2] -= step
-
-                if keyboard.is_pressed('i'):
-                    if self.control[3] < 1680: self.control[3] += step
-                elif keyboard.is_pressed('k'):
-                    if self.control[3] > 360: self.control[3] -= step
-
-                # エルロン2（CH6）を360～1680範囲に正規化
-                if keyboard.is_pressed('q'):
-                    self.control[5] = 360   # 設定倥をQキー用に調整
-                elif keyboard.is_pressed('e'):
-                    self.control[5] = 1680  # 設定倥をEキー用に調整
-
-                # トグルキー（状態追跡ベースデバウンス - time.sleep不要）
-                for key, (sw_idx, ctrl_idx) in toggle_map.items():
-                    if keyboard.is_pressed(key):
-                        if key not in self._toggle_key_pressed:
-                            self._toggle_key_pressed.add(key)
-                            self.switch_states[sw_idx] = (self.switch_states[sw_idx] % 3) + 1
-                            self.control[ctrl_idx] = [500, 1000, 1500][self.switch_states[sw_idx] - 1]
-                    else:
-                        self._toggle_key_pressed.discard(key)
-
-                # リセット
-                if keyboard.is_pressed('R'):
-                    if 'R' not in self._toggle_key_pressed:
-                        self._toggle_key_pressed.add('R')
-                        self.control = [1000] * 16
-                        self.control[4] = 500
-                        for _i in range(6, 16):
-                            self.control[_i] = 500
-                        self.switch_states = [1] * 11
-                else:
-                    self._toggle_key_pressed.discard('R')
+                # 設定ファイルから生成した変換表でキー入力を反映
+                self.mapper.poll(self.control, keyboard.is_pressed)
 
                 time.sleep(0.005)  # 5msポーリング（応答性向上）
             except Exception as e:
@@ -365,8 +330,9 @@ class SBUSControllerMonitorApp:
     
     def update_gui(self):
         """GUI更新"""
+        channels = self.output_channels()  # 送信される値（ミキシング後）
         for i in range(16):
-            value = self.control[i]
+            value = channels[i]
             self.controller_labels[i]['label'].config(text=str(value))
             # プログレスバーの値を0-100に正規化（500-1500の範囲）
             normalized_value = (value - 500) / 10
@@ -377,26 +343,30 @@ class SBUSControllerMonitorApp:
         text_buffer = ""
         while self.running:
             try:
-                if self.ser and self.ser.is_open and self.ser.in_waiting:
+                tx_proc = self.tx_proc
+                if tx_proc:
+                    # 送信プロセスが受信したバイト列を受け取る
+                    byte_data = tx_proc.receive()
+                elif self.ser and self.ser.is_open and self.ser.in_waiting:
                     # 1バイト読み込む
                     byte_data = self.ser.read(1)
-                    if byte_data:
-                        char = byte_data.decode('utf-8', errors='ignore')
-                        
-                        # \n（LF）で行が完成
-                        if char == '\n':
-                            if text_buffer.strip():
-                                self.monitor_text.insert(tk.END, text_buffer + '\n')
-                                self.monitor_text.see(tk.END)
-                            text_buffer = ""
-                        # \r（CR）は無視
-                        elif char == '\r':
-                            pass
-                        # その他の文字をバッファに追加
-                        else:
-                            text_buffer += char
                 else:
                     time.sleep(0.01)
+                    continue
+
+                for char in byte_data.decode('utf-8', errors='ignore'):
+                    # \n（LF）で行が完成
+                    if char == '\n':
+                        if text_buffer.strip():
+                            self.monitor_text.insert(tk.END, text_buffer + '\n')
+                            self.monitor_text.see(tk.END)
+                        text_buffer = ""
+                    # \r（CR）は無視
+                    elif char == '\r':
+                        pass
+                    # その他の文字をバッファに追加
+                    else:
+                        text_buffer += char
             except Exception as e:
                 print(f"Serial receive error: {e}")
                 time.sleep(0.1)
@@ -405,23 +375,57 @@ class SBUSControllerMonitorApp:
         """メインループ"""
         while self.running:
             try:
+                error = self.tx_proc.error() if self.tx_proc else None
+                if error:
+                    # 送信プロセスがポートを開けずに終了した
+                    self.tx_proc.stop()
+                    self.tx_proc = None
+                    self.status_var.set(f"Status: Error - {error}")
+                    self.tx_stats_var.set("")
+                
+                if self.tx_proc:
+                    # 送信プロセスにチャンネル値を渡す（エンコード・送信は子プロセス側）
+                    # UDPの新しい値は受信スレッドが渡すので、ここではキー入力とフェイルセーフへの切り替えを渡す
+                    self.push_channels()
+                    self.tx_stats_var.set(self.format_stats())
+                    self.update_gui()
+                    self.root.update_idletasks()
+                    time.sleep(TX_PERIOD)
+                    continue
+                
+                # UDPで受け取った最新の値を反映（受信時刻を遅延計測に使う）
+                stamp = self.udp.apply(self.control) if self.udp else None
+                
                 # データ変換
                 self.convert_data()
                 
                 # シリアル送信
                 if self.ser and self.ser.is_open:
-                    self.ser.write(bytes(self.data))
+                    self.tx.send(bytes(self.data), stamp)
+                    self.tx_stats_var.set(self.format_stats())
                 
                 # GUI更新
                 self.update_gui()
                 self.root.update_idletasks()
                 
-                time.sleep(0.01)
+                if self.tx:
+                    self.tx.wait_next_period()
+                else:
+                    time.sleep(TX_PERIOD)
             except Exception as e:
                 print(f"Main loop error: {e}")
     
+    def format_stats(self):
+        """ステータス欄の送信統計（UDP入力の状態を含む）"""
+        text = self.tx_proc.format_stats() if self.tx_proc else self.tx.format_stats()
+        if self.udp:
+            text += "\n" + self.udp.format_stats()
+        return text
+    
     def on_closing(self):
         self.running = False
+        if self.udp:
+            self.udp.stop()
         keyboard.unhook_all()
         self.disconnect_serial()
         self.root.destroy()
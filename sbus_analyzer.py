@@ -0,0 +1,528 @@
+"""SBUSキャプチャファイルのオフライン解析ツール
+
+キャプチャをメモリマップし、numpyでまとめてデコードする（1000万フレームでも数秒）
+
+対応フォーマット:
+  raw         : シリアルから受信したバイト列そのまま（ゴミデータ・欠けたフレームを含んでよい）
+  timestamped : [float64 タイムスタンプ(秒, little endian)] + [25バイトのフレーム] の繰り返し
+
+使い方:
+  python sbus_analyzer.py capture.bin
+  python sbus_analyzer.py capture.bin --export frames.csv
+  python sbus_analyzer.py capture.tsb --format timestamped --export frames.parquet
+  python sbus_analyzer.py --self-test   # デコード処理の照合
+"""
+import argparse
+import mmap
+import sys
+import time
+import traceback
+
+import numpy as np
+
+from sbus_protocol import (FRAME_LENGTH, HEADER, FOOTER, NUM_CHANNELS, CHANNEL_BITS,
+                           CHANNEL_MASK, FLAG_CH17, FLAG_CH18, FLAG_FRAME_LOST, FLAG_FAILSAFE,
+                           decode_frame, encode_frame)
+
+CHUNK_FRAMES = 1 << 20  # 一度に処理するフレーム数（メモリ使用量の上限）
+TIMESTAMPED_DTYPE = np.dtype([('t', '<f8'), ('frame', 'u1', (FRAME_LENGTH,))])
+
+EXPORT_COLUMNS = ([f'ch{i + 1}' for i in range(NUM_CHANNELS)]
+                  + ['ch17', 'ch18', 'frame_lost', 'failsafe'])
+
+
+def _frame_candidates(buf, start, hi, last_offset):
+    """buf[start:hi) に収まるヘッダー(0x0F)とフッター(0x00)が一致する位置"""
+    window = buf[start:hi]
+    m = window.size - (FRAME_LENGTH - 1)
+    if m <= 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.flatnonzero((window[:m] == HEADER) & (window[FRAME_LENGTH - 1:] == FOOTER))
+    offsets = offsets.astype(np.int64) + start
+    # 前のチャンクで採用したフレームと重なる候補は捨てる
+    return offsets[offsets >= last_offset + FRAME_LENGTH]
+
+
+def _contains(sorted_values, values):
+    """values の各要素が昇順の配列 sorted_values に含まれるか"""
+    idx = np.minimum(np.searchsorted(sorted_values, values), sorted_values.size - 1)
+    return sorted_values[idx] == values
+
+
+def _select_phases(offsets, last_offset, size):
+    """重なり合う候補のまとまりごとに位相を1つ選ぶ
+
+    (採用する候補, 末尾のまとまりの位相を決める手がかりが無いか) を返す
+    """
+    if offsets.size < 2:
+        return offsets, False
+
+    # 重なりのまとまり（通常のキャプチャでは候補1つずつ）
+    cluster = np.concatenate(([0], np.cumsum(np.diff(offsets) >= FRAME_LENGTH)))
+    if cluster[-1] == offsets.size - 1:
+        return offsets, False
+
+    # 複数の候補を含むまとまりだけを対象にする
+    multi = np.bincount(cluster)[cluster] > 1
+    group = offsets[multi]
+    cluster = cluster[multi]
+
+    # (まとまり, 位相) ごとの候補数・最初と最後の候補
+    key = cluster * FRAME_LENGTH + group % FRAME_LENGTH
+    uniq, first_idx, inverse, counts = np.unique(key, return_index=True,
+                                                 return_inverse=True, return_counts=True)
+    last_idx = group.size - 1 - np.unique(key[::-1], return_index=True)[1]
+    uniq_cluster = uniq // FRAME_LENGTH
+
+    # 前のチャンクと同じ位相（チャンク先頭のまとまりのみ）
+    continues = ((uniq_cluster == 0) & (last_offset >= 0)
+                 & (uniq % FRAME_LENGTH == last_offset % FRAME_LENGTH))
+    # 定常的に埋め込まれた偽の位相は本物と同じ周期で並ぶため、列の両端で判定する:
+    # まとまりの外の候補とちょうど25バイトでつながる、またはファイルの最後で終わる位相が本物
+    before = group[first_idx] - FRAME_LENGTH
+    after = group[last_idx] + FRAME_LENGTH
+    linked_before = _contains(offsets, before) | ((last_offset >= 0) & (before == last_offset))
+    linked = linked_before | _contains(offsets, after) | (after == size)
+
+    order = np.lexsort((first_idx, -counts, ~linked, ~continues, uniq_cluster))
+    best = order[np.concatenate(([True], np.diff(uniq_cluster[order]) != 0))]
+    chosen = np.zeros(uniq.size, dtype=bool)
+    chosen[best] = True
+    keep = ~multi
+    keep[multi] = chosen[inverse.ravel()]
+
+    # 末尾のまとまりは後ろのつながりがまだ分からない（前側の手がかりがあれば決まる）
+    tail = uniq_cluster == uniq_cluster[-1]
+    undecided = bool(multi[-1]) and not (continues | linked_before)[tail].any()
+    return offsets[keep], undecided
+
+
+def find_frame_offsets(buf, start, stop, last_offset):
+    """buf[start:stop) に先頭があるSBUSフレームのオフセットを検出
+
+    ヘッダー(0x0F)とフッター(0x00)が一致する位置を候補とする。
+    25バイト未満の間隔で重なり合う候補のまとまりごとに、25バイト周期の位相（offset % 25）を
+    1つ選び、その位相の候補だけを残す。優先順は、前のチャンクと同じ位相、まとまりの外の
+    フレームとつながる位相、候補数が最多の位相、先に現れた位相。
+    チャンク末尾のまとまりを決める手がかりが無い場合（途中から始まったキャプチャなど）は、
+    まとまりが終わるまで先読みする
+    last_offset は前のチャンクで最後に採用したオフセット（無ければ負の値）
+    """
+    extra = 0
+    while True:
+        hi = min(stop + FRAME_LENGTH - 1 + extra, buf.size)
+        offsets = _frame_candidates(buf, start, hi, last_offset)
+        chosen, undecided = _select_phases(offsets, last_offset, buf.size)
+        # 末尾のまとまりが先読み範囲の外まで続いている可能性があれば範囲を広げる
+        if not undecided or hi >= buf.size or offsets[-1] + 2 * FRAME_LENGTH <= hi:
+            return chosen[chosen < stop]
+        extra = max(2 * extra, stop - start, FRAME_LENGTH)
+
+
+def decode_frames(frames):
+    """(N, 25) のフレーム配列を (N, 16) のチャンネル値とフラグバイトにデコード"""
+    channels = np.empty((frames.shape[0], NUM_CHANNELS), dtype=np.uint16)
+    for ch in range(NUM_CHANNELS):
+        bit = CHANNEL_BITS * ch
+        i = 1 + bit // 8
+        word = (frames[:, i].astype(np.uint32)
+                | (frames[:, i + 1].astype(np.uint32) << 8)
+                | (frames[:, i + 2].astype(np.uint32) << 16))
+        channels[:, ch] = (word >> (bit % 8)) & CHANNEL_MASK
+    return channels, frames[:, 23]
+
+
+class CaptureStats:
+    """チャンクごとのデコード結果を集計"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bad_frames = 0
+        self.ch_min = np.full(NUM_CHANNELS, CHANNEL_MASK, dtype=np.int64)
+        self.ch_max = np.zeros(NUM_CHANNELS, dtype=np.int64)
+        self.ch_sum = np.zeros(NUM_CHANNELS, dtype=np.int64)
+        self.hist = np.zeros((NUM_CHANNELS, CHANNEL_MASK + 1), dtype=np.int64)
+        self.flag_counts = {'ch17': 0, 'ch18': 0, 'frame_lost': 0, 'failsafe': 0}
+        self.failsafe_events = 0
+        self._last_failsafe = False
+        # raw: フレーム間の読み飛ばしバイト, timestamped: フレーム間隔
+        self.skipped_bytes = 0
+        self.gap_count = 0
+        self.intervals = []
+        self._last_time = None
+
+    def add(self, channels, flags):
+        n = channels.shape[0]
+        if n == 0:
+            return
+        self.frames += n
+        np.minimum(self.ch_min, channels.min(axis=0), out=self.ch_min)
+        np.maximum(self.ch_max, channels.max(axis=0), out=self.ch_max)
+        self.ch_sum += channels.sum(axis=0, dtype=np.int64)
+        for ch in range(NUM_CHANNELS):
+            self.hist[ch] += np.bincount(channels[:, ch], minlength=CHANNEL_MASK + 1)
+
+        for name, bit in (('ch17', FLAG_CH17), ('ch18', FLAG_CH18),
+                          ('frame_lost', FLAG_FRAME_LOST), ('failsafe', FLAG_FAILSAFE)):
+            self.flag_counts[name] += int(np.count_nonzero(flags & bit))
+
+        # フェイルセーフに入った回数（立ち上がりエッジ）
+        failsafe = (flags & FLAG_FAILSAFE) != 0
+        prev = np.concatenate(([self._last_failsafe], failsafe[:-1]))
+        self.failsafe_events += int(np.count_nonzero(failsafe & ~prev))
+        self._last_failsafe = bool(failsafe[-1])
+
+    def add_offsets(self, offsets, last_offset):
+        """rawフォーマット: フレーム間に読み飛ばしたバイトをギャップとして数える"""
+        if offsets.size == 0:
+            return
+        prev_end = np.concatenate(([last_offset + FRAME_LENGTH], offsets[:-1] + FRAME_LENGTH))
+        skipped = offsets - prev_end
+        self.gap_count += int(np.count_nonzero(skipped > 0))
+        self.skipped_bytes += int(skipped.sum())
+
+    def add_times(self, times):
+        """timestampedフォーマット: フレーム間隔を蓄積"""
+        if times.size == 0:
+            return
+        if self._last_time is not None:
+            times = np.concatenate(([self._last_time], times))
+        self.intervals.append(np.diff(times).astype(np.float32))
+        self._last_time = times[-1]
+
+
+def _csv_field(values, width, decimals):
+    """整数配列を width 桁の数字と区切り文字に分解する（最後の軸が文字、書かない文字は0）"""
+    chars = []
+    for pos in range(width):
+        if decimals and pos == width - decimals:
+            chars.append(np.full(values.shape, ord('.'), dtype=np.uint8))
+        p = 10 ** (width - 1 - pos)
+        digit = (values // p % 10 + ord('0')).astype(np.uint8)
+        if pos < width - 1 - decimals:
+            # 先頭の0は書かない（整数部の1の位と小数部は残す）
+            digit[values < p] = 0
+        chars.append(digit)
+    chars.append(np.full(values.shape, ord(','), dtype=np.uint8))
+    return np.stack(chars, axis=-1)
+
+
+def _csv_bytes(fields):
+    """0以上の整数の列をまとめてCSVの行に変換する（np.savetxt のように1行ずつ書式化しない）
+
+    fields は (値, 小数点以下の桁数) のリスト。値は (n,) または (n, 列数) の整数配列で、
+    小数点以下の桁数が d なら値を 10**d で割った固定小数点数として書く
+    """
+    chars = []
+    for values, decimals in fields:
+        values = values.reshape(values.shape[0], -1)
+        top = int(values.max())
+        width = max(len(str(top)), decimals + 1)
+        if top < 1 << 16:
+            # チャンネル値などの小さな値は、全ての値の文字列を先に作って引く
+            field = _csv_field(np.arange(top + 1), width, decimals)[values]
+        else:
+            field = _csv_field(values, width, decimals)
+        chars.append(field.reshape(values.shape[0], -1))
+    chars = np.concatenate(chars, axis=1)
+    chars[:, -1] = ord('\n')
+    return chars[chars != 0].tobytes()
+
+
+class FrameExporter:
+    """デコード結果をCSV / npz / parquet に書き出す（拡張子で判定）"""
+
+    def __init__(self, path, timestamped):
+        self.path = path
+        self.kind = path.rsplit('.', 1)[-1].lower()
+        self.index_name = 'timestamp' if timestamped else 'offset'
+        self._chunks = []
+        self._writer = None
+        self._fh = None
+
+        if self.kind == 'csv':
+            self._fh = open(path, 'wb')
+            self._fh.write((','.join([self.index_name] + EXPORT_COLUMNS) + '\n').encode())
+        elif self.kind == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise SystemExit("parquet出力には pyarrow が必要です (pip install pyarrow)")
+        elif self.kind != 'npz':
+            raise SystemExit(f"未対応の出力形式です: .{self.kind} (csv / npz / parquet)")
+
+    def write(self, index, channels, flags):
+        flag_bits = np.stack([(flags & bit) != 0 for bit in
+                              (FLAG_CH17, FLAG_CH18, FLAG_FRAME_LOST, FLAG_FAILSAFE)], axis=1)
+
+        if self.kind == 'csv':
+            if index.size == 0:
+                return
+            body = np.hstack([channels, flag_bits]).astype(np.int64)
+            if self.index_name == 'offset':
+                self._fh.write(_csv_bytes([(index, 0), (body, 0)]))
+            elif np.isfinite(index).all() and index.min() >= 0:
+                # タイムスタンプは µs 単位の整数にして小数点以下6桁で書く
+                # （エポック秒のような大きな値でも丸めがずれないよう、整数部と小数部を分けて変換）
+                seconds = np.floor(index)
+                micros = (seconds.astype(np.int64) * 1000000
+                          + np.round((index - seconds) * 1e6).astype(np.int64))
+                self._fh.write(_csv_bytes([(micros, 6), (body, 0)]))
+            else:
+                table = np.hstack([index.reshape(-1, 1), body])
+                np.savetxt(self._fh, table, fmt=['%.6f'] + ['%d'] * body.shape[1], delimiter=',')
+        elif self.kind == 'npz':
+            self._chunks.append((index, channels, flag_bits))
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            columns = {self.index_name: pa.array(index)}
+            for ch in range(NUM_CHANNELS):
+                columns[EXPORT_COLUMNS[ch]] = pa.array(channels[:, ch])
+            for j, name in enumerate(EXPORT_COLUMNS[NUM_CHANNELS:]):
+                columns[name] = pa.array(flag_bits[:, j])
+            table = pa.table(columns)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+
+    def close(self):
+        if self.kind == 'csv':
+            self._fh.close()
+        elif self.kind == 'npz':
+            if self._chunks:
+                index = np.concatenate([c[0] for c in self._chunks])
+                channels = np.concatenate([c[1] for c in self._chunks])
+                flag_bits = np.concatenate([c[2] for c in self._chunks])
+            else:
+                index = np.empty(0)
+                channels = np.empty((0, NUM_CHANNELS), dtype=np.uint16)
+                flag_bits = np.empty((0, 4), dtype=bool)
+            arrays = {self.index_name: index, 'channels': channels}
+            for j, name in enumerate(EXPORT_COLUMNS[NUM_CHANNELS:]):
+                arrays[name] = flag_bits[:, j]
+            np.savez(self.path, **arrays)
+        elif self._writer is not None:
+            self._writer.close()
+
+
+def analyze_raw(buf, stats, exporter):
+    last_offset = -FRAME_LENGTH
+    chunk_bytes = CHUNK_FRAMES * FRAME_LENGTH
+    for start in range(0, buf.size, chunk_bytes):
+        stop = min(start + chunk_bytes, buf.size)
+        offsets = find_frame_offsets(buf, start, stop, last_offset)
+        if offsets.size == 0:
+            continue
+        first = int(offsets[0])
+        if int(offsets[-1]) - first == (offsets.size - 1) * FRAME_LENGTH:
+            # 隙間なく並んでいる場合はコピーせずに2次元ビューとして扱う
+            frames = buf[first:first + offsets.size * FRAME_LENGTH].reshape(-1, FRAME_LENGTH)
+        else:
+            frames = buf[offsets[:, None] + np.arange(FRAME_LENGTH)]
+        channels, flags = decode_frames(frames)
+        stats.add(channels, flags)
+        stats.add_offsets(offsets, last_offset)
+        if exporter:
+            exporter.write(offsets, channels, flags)
+        last_offset = int(offsets[-1])
+
+    # 最後のフレーム以降の読み飛ばし
+    tail = buf.size - (last_offset + FRAME_LENGTH)
+    if tail > 0:
+        stats.gap_count += 1
+        stats.skipped_bytes += tail
+
+
+def analyze_timestamped(buf, stats, exporter):
+    count = buf.size // TIMESTAMPED_DTYPE.itemsize
+    records = np.frombuffer(buf, dtype=TIMESTAMPED_DTYPE, count=count)
+    for start in range(0, count, CHUNK_FRAMES):
+        chunk = records[start:start + CHUNK_FRAMES]
+        frames = chunk['frame']
+        valid = (frames[:, 0] == HEADER) & (frames[:, 24] == FOOTER)
+        stats.bad_frames += int(valid.size - np.count_nonzero(valid))
+        frames = frames[valid]
+        times = chunk['t'][valid]
+        channels, flags = decode_frames(frames)
+        stats.add(channels, flags)
+        stats.add_times(times)
+        if exporter:
+            exporter.write(times, channels, flags)
+
+
+def format_histogram(hist, lo, hi, bins, width=40):
+    """lo～hi の範囲を bins 個に分けた横棒グラフ"""
+    bins = max(1, min(bins, hi - lo + 1))
+    edges = np.linspace(lo, hi + 1, bins + 1).astype(np.int64)
+    edges = np.unique(edges)
+    counts = np.add.reduceat(hist[lo:hi + 1], edges[:-1] - lo)
+    peak = max(int(counts.max()), 1)
+    lines = []
+    for i, c in enumerate(counts):
+        bar = '#' * int(round(width * c / peak))
+        lines.append(f"    {edges[i]:4d}-{edges[i + 1] - 1:4d} | {bar} {c}")
+    return lines
+
+
+def print_report(stats, timestamped, bins, gap_ms):
+    print(f"Frames        : {stats.frames}")
+    if timestamped:
+        print(f"Bad records   : {stats.bad_frames}")
+    if stats.frames == 0:
+        return
+
+    mean = stats.ch_sum / stats.frames
+    print("\nChannel statistics:")
+    print("  CH     min    max     mean")
+    for ch in range(NUM_CHANNELS):
+        print(f"  CH{ch + 1:<3d} {stats.ch_min[ch]:5d}  {stats.ch_max[ch]:5d}  {mean[ch]:7.1f}")
+
+    print("\nFlags (byte 23):")
+    for name, count in stats.flag_counts.items():
+        print(f"  {name:<11s}: {count} ({100.0 * count / stats.frames:.3f}%)")
+    print(f"  failsafe entered: {stats.failsafe_events} times")
+
+    if timestamped:
+        intervals = (np.concatenate(stats.intervals) if stats.intervals
+                     else np.empty(0, dtype=np.float32))
+        if intervals.size:
+            ms = intervals.astype(np.float64) * 1000.0
+            p50, p99 = np.percentile(ms, [50, 99])
+            print("\nFrame interval (ms):")
+            print(f"  min {ms.min():.3f}  mean {ms.mean():.3f}  median {p50:.3f}  "
+                  f"p99 {p99:.3f}  max {ms.max():.3f}  std {ms.std():.3f}")
+            threshold = gap_ms if gap_ms is not None else 3.0 * p50
+            gaps = ms[ms > threshold]
+            print(f"\nGaps (> {threshold:.3f} ms): {gaps.size}"
+                  + (f", total {gaps.sum():.1f} ms, longest {gaps.max():.1f} ms" if gaps.size else ""))
+    else:
+        print(f"\nGaps (skipped bytes between frames): {stats.gap_count}, "
+              f"total {stats.skipped_bytes} bytes")
+
+    if bins > 0:
+        print("\nHistograms:")
+        for ch in range(NUM_CHANNELS):
+            print(f"  CH{ch + 1}")
+            for line in format_histogram(stats.hist[ch], int(stats.ch_min[ch]),
+                                         int(stats.ch_max[ch]), bins):
+                print(line)
+
+
+def self_test(n=5000, seed=0):
+    """find_frame_offsets / decode_frames を sbus_protocol の1フレームずつの実装と照合
+
+    ランダムな値のフレームに、ゴミデータ・欠けたフレーム・データ中に 0x0F...0x00 が
+    毎フレーム現れるパターン（CH1=1792, CH2=1）を混ぜ、チャンク境界も跨がせる。
+    先頭はそのパターンの同じフレームが続く区間とし、フレームの途中から始まる場合も確認する
+    """
+    rng = np.random.default_rng(seed)
+    steady = [1792, 1] + [1000] * (NUM_CHANNELS - 2)
+    stream = bytearray()
+    expected = []
+    for i in range(n):
+        if i < 300:
+            channels = steady
+        elif i % 500 < 50:
+            channels = [1792, 1] + [int(v) for v in rng.integers(0, 2048, NUM_CHANNELS - 2)]
+        else:
+            channels = [int(v) for v in rng.integers(0, 2048, NUM_CHANNELS)]
+        flags = 0 if i < 300 else int(rng.choice([0, FLAG_FRAME_LOST, FLAG_FAILSAFE, FLAG_CH17 | FLAG_CH18]))
+        frame = encode_frame(channels, flags)
+        if i % 997 == 500:
+            stream += bytes(rng.integers(1, 256, 7, dtype=np.uint8))  # ゴミデータ
+        if i % 1499 == 700:
+            stream += frame[:12]  # 欠けたフレーム
+            continue
+        stream += frame
+        expected.append((channels, flags))
+
+    ok = True
+
+    # 1フレームずつの実装と同じ値にデコードできるか
+    frames = np.frombuffer(b''.join(encode_frame(c, f) for c, f in expected),
+                           dtype=np.uint8).reshape(-1, FRAME_LENGTH)
+    channels, flags = decode_frames(frames)
+    for i in range(frames.shape[0]):
+        if (channels[i].tolist(), int(flags[i])) != decode_frame(bytes(frames[i])):
+            print(f"decode_frames mismatch at frame {i}")
+            ok = False
+            break
+
+    # 先頭を削ってフレームの途中から始め、チャンクを小さくしてオフセット検出を実行
+    for cut in (0, 1, 2, 13):
+        buf = np.frombuffer(bytes(stream[cut:]), dtype=np.uint8)
+        offsets = []
+        last_offset = -FRAME_LENGTH
+        chunk_bytes = 97 * FRAME_LENGTH + 3
+        for start in range(0, buf.size, chunk_bytes):
+            found = find_frame_offsets(buf, start, min(start + chunk_bytes, buf.size), last_offset)
+            if found.size:
+                offsets.extend(found.tolist())
+                last_offset = int(found[-1])
+        decoded = [decode_frame(bytes(buf[o:o + FRAME_LENGTH])) for o in offsets]
+        if decoded != expected[1 if cut else 0:]:
+            print(f"find_frame_offsets (start at byte {cut}): "
+                  f"{len(decoded)} frames found, {len(expected) - bool(cut)} expected")
+            ok = False
+
+    print("self-test " + ("passed" if ok else "FAILED"))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SBUSキャプチャファイルの解析")
+    parser.add_argument('capture', nargs='?', help="キャプチャファイル")
+    parser.add_argument('--format', choices=['raw', 'timestamped'], default='raw',
+                        help="キャプチャ形式（既定: raw）")
+    parser.add_argument('--export', metavar='PATH',
+                        help="デコード結果の出力先（.csv / .npz / .parquet）")
+    parser.add_argument('--bins', type=int, default=10,
+                        help="ヒストグラムの分割数（0で非表示）")
+    parser.add_argument('--gap-ms', type=float, default=None,
+                        help="ギャップとみなすフレーム間隔[ms]（既定: 中央値の3倍）")
+    parser.add_argument('--self-test', action='store_true',
+                        help="numpy版のデコードを sbus_protocol の実装と照合して終了")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    if args.capture is None:
+        parser.error("capture is required")
+
+    timestamped = args.format == 'timestamped'
+    stats = CaptureStats()
+    exporter = FrameExporter(args.export, timestamped) if args.export else None
+
+    t0 = time.perf_counter()
+    with open(args.capture, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空ファイルはmmapできない
+            mm = None
+        buf = np.frombuffer(mm, dtype=np.uint8) if mm else np.empty(0, dtype=np.uint8)
+        try:
+            if timestamped:
+                analyze_timestamped(buf, stats, exporter)
+            else:
+                analyze_raw(buf, stats, exporter)
+        except BaseException as e:
+            # トレースバック中のフレームもビューを参照しているので、ローカル変数を消してから送出する
+            traceback.clear_frames(e.__traceback__)
+            raise
+        finally:
+            # mmap を閉じる前に numpy のビューを解放する（残っていると BufferError になる）
+            del buf
+            if exporter:
+                exporter.close()
+            if mm:
+                mm.close()
+    elapsed = time.perf_counter() - t0
+
+    print_report(stats, timestamped, args.bins, args.gap_ms)
+    print(f"\nProcessed in {elapsed:.2f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,39 @@
 import serial
-import time
 import keyboard
+from sbus_protocol import frame_airtime
+from sbus_transmitter import SBUSTransmitter
+from sbus_mapping import InputMapper, DEFAULT_MAPPING_FILE
+from sbus_status_display import StatusDisplay
+from sbus_udp_input import UDPChannelInput, DEFAULT_HOST, DEFAULT_PORT
+
+MAPPING_FILE = DEFAULT_MAPPING_FILE
+
+# UDPでチャンネル値を受け取る（地上局・シミュレーター連携）。有効時はキーボード入力を使わない
+UDP_ENABLED = False
+UDP_HOST = DEFAULT_HOST
+UDP_PORT = DEFAULT_PORT
+UDP_TIMEOUT = 0.2  # この時間受信がなければ sbus_mapping.json の failsafe 値にする[s]
 
 # COM5の部分を使用するポートに合わせて変更
-ser = serial.Serial('com7', baudrate=115200, parity=serial.PARITY_NONE, stopbits=1, timeout=1)
+# write_timeout: 書き込みで送信ループが止まらないよう2フレーム分で打ち切る
+ser = serial.Serial('com7', baudrate=115200, parity=serial.PARITY_NONE, stopbits=1, timeout=1,
+                    write_timeout=2 * frame_airtime(115200, 8, serial.PARITY_NONE, 1))
+
+# 送信周期（SBUS: 2ms）。回線速度で1フレームにかかる時間より短い場合はそちらに合わせる
+tx = SBUSTransmitter(ser, period=0.002)
+DISPLAY_RATE = 20.0  # ステータス表示の更新頻度[Hz]
+
+# キー割り当て・スイッチ段階・ミキシングは sbus_mapping.json で設定
+mapper = InputMapper.load(MAPPING_FILE)
 
 # 送信データの初期化
 data = [0] * 25 
-control = [0] * 16
-
-# 送信データの入力
-# プロポスティック（ラジコン飛行機モード）
-control[0] = 1000  # CH1: ヨー
-control[1] = 1000  # CH2: ロール
-control[2] = 1000  # CH3: スロットル
-control[3] = 1000  # CH4: ピッチ
-control[4] = 500   # CH5: 投下装置（スイッチ初期値 500）
-control[5] = 1000  # CH6: エルロン2
-
-# 3段階切り替えチャンネル（スイッチ初期値 500 = switch_states=1 に対応）
-control[6] = 500   # CH7: キー1
-control[7] = 500   # CH8: キー2
-control[8] = 500   # CH9: キー3
-control[9] = 500   # CH10: キー4
-control[10] = 500  # CH11: キー5
-control[11] = 500  # CH12: キー6
-control[12] = 500  # CH13: キー7
-control[13] = 500  # CH14: キー8
-control[14] = 500  # CH15: キー9
-control[15] = 500  # CH16: キー-
-
-# 各チャンネルの3段階切り替え状態を管理
-# [0]=CH5, [1]=CH7, [2]=CH8, ..., [6]=CH12, [7]=CH13, ..., [10]=CH16
-switch_states = [1] * 11  # キー状態（1=500, 2=1000, 3=1500）
-
-# トグルキーの押下状態追跡（デバウンス用）
-toggle_key_pressed = set()
+control = mapper.initial_values()  # キー操作で変化する値（ミキシング前）
+
+udp = None
+if UDP_ENABLED:
+    udp = UDPChannelInput(UDP_HOST, UDP_PORT, timeout=UDP_TIMEOUT)
+    udp.start()
 
 
 # SBUSのデータ
@@ -43,7 +41,8 @@ toggle_key_pressed = set()
 
 def convert_data():
     """SBUSデータに変換 - 16チャンネル対応"""
-    channels = control  # 16チャンネルすべてを使用
+    # 16チャンネルすべてを使用（ミキシング後。UDP入力が途絶えている間は failsafe の値）
+    channels = mapper.output(control, udp is not None and not udp.active)
     
     data[0] = 0x0F  # ヘッダー
     
@@ -75,103 +74,33 @@ def convert_data():
     data[24] = 0x00  # フッター
 
 def CheckKeybord():
-    global toggle_key_pressed
-
-    # ヨー（CH1）
-    if keyboard.is_pressed('j'):
-        if(control[0] < 1680):
-            control[0] += 10
-            print("CH1 (Yaw):" + str(control[0]))
-    elif keyboard.is_pressed('l'):
-        if(control[0] > 360):
-            control[0] -= 10
-            print("CH1 (Yaw):" + str(control[0]))
-
-    # ロール（CH2）
-    if keyboard.is_pressed('a'):
-        if(control[1] < 1680):
-            control[1] += 10
-            print("CH2 (Roll):" + str(control[1]))
-    elif keyboard.is_pressed('d'):
-        if(control[1] > 360):
-            control[1] -= 10
-            print("CH2 (Roll):" + str(control[1]))
-
-    # スロットル（CH3）
-    if keyboard.is_pressed('w'):
-        if(control[2] < 1680):
-            control[2] += 10
-            print("CH3 (Throttle):" + str(control[2]))
-    elif keyboard.is_pressed('s'):
-        if(control[2] > 360):
-            control[2] -= 10
-            print("CH3 (Throttle):" + str(control[2]))
-
-    # ピッチ（CH4）
-    if keyboard.is_pressed('i'):
-        if(control[3] < 1680):
-            control[3] += 10
-            print("CH4 (Pitch):" + str(control[3]))
-    elif keyboard.is_pressed('k'):
-        if(control[3] > 360):
-            control[3] -= 10
-            print("CH4 (Pitch):" + str(control[3]))
-
-    # トグルキー処理（状態追跡ベースのデバウンス - time.sleep不要）
-    # {キー: (switch_statesインデックス, controlインデックス, チャンネル名)}
-    toggle_map = {
-        '0': (0, 4,  'CH5 (Drop Device)'),
-        '1': (1, 6,  'CH7 (Key1)'),
-        '2': (2, 7,  'CH8 (Key2)'),
-        '3': (3, 8,  'CH9 (Key3)'),
-        '4': (4, 9,  'CH10 (Key4)'),
-        '5': (5, 10, 'CH11 (Key5)'),
-        '6': (6, 11, 'CH12 (Key6)'),
-        '7': (7, 12, 'CH13 (Key7)'),
-        '8': (8, 13, 'CH14 (Key8)'),
-        '9': (9, 14, 'CH15 (Key9)'),
-        '-': (10, 15, 'CH16 (Key-)'),
-    }
-    for key, (sw_idx, ctrl_idx, ch_name) in toggle_map.items():
-        if keyboard.is_pressed(key):
-            if key not in toggle_key_pressed:
-                toggle_key_pressed.add(key)
-                switch_states[sw_idx] = (switch_states[sw_idx] % 3) + 1
-                val = [500, 1000, 1500][switch_states[sw_idx] - 1]
-                control[ctrl_idx] = val
-                print(f"{ch_name}: {val}")
+    # 表示はステータス表示スレッドが行う（送信ループでは print しない）
+    changed, reset = mapper.poll(control, keyboard.is_pressed)
+    if reset:
+        display.message = "Reset - All channels to default"
+    elif changed:
+        # 最後に操作したチャンネルと値（ミキシング前）
+        display.message = "Input: " + ", ".join(f"CH{ch + 1}={control[ch]}" for ch in changed)
+
+# 全チャンネル・スイッチ状態・送信統計を一定周期で再描画
+display = StatusDisplay(mapper, control, tx, rate=DISPLAY_RATE, udp=udp)
+display.start()
+
+try:
+    while(1):
+
+        stamp = None
+        if udp:
+            stamp = udp.apply(control) # UDPで受け取った最新の値を反映（受信時刻を遅延計測に使う）
         else:
-            toggle_key_pressed.discard(key)
-
-    # エルロン2（CH6） - qとeで直接値設定を360～1680範囲に正規化
-    if keyboard.is_pressed('q'):
-        control[5] = 360
-        print("CH6 (Aileron 2): 360")
-    elif keyboard.is_pressed('e'):
-        control[5] = 1680
-        print("CH6 (Aileron 2): 1680")
-
-    # リセット（Rキー）
-    if keyboard.is_pressed('R'):
-        if 'R' not in toggle_key_pressed:
-            toggle_key_pressed.add('R')
-            for i in range(4):   # CH1-CH4: 1000
-                control[i] = 1000
-            control[4] = 500     # CH5
-            control[5] = 1000    # CH6
-            for i in range(6, 16):  # CH7-CH16: 500
-                control[i] = 500
-            for i in range(11):
-                switch_states[i] = 1
-            print("Reset - All channels to 1000")
-    else:
-        toggle_key_pressed.discard('R')
-
-while(1):
-
-    CheckKeybord() # キーボードの入力を確認
-
-    convert_data() # データの変換
-
-    ser.write(data) # 送信
-    time.sleep(0.002) # 送信間隔（SBUS: 2ms）
+            CheckKeybord() # キーボードの入力を確認
+
+        convert_data() # データの変換
+
+        tx.send(bytes(data), stamp) # 送信（回線が詰まっている場合は破棄）
+
+        tx.wait_next_period() # 送信間隔
+finally:
+    display.stop()
+    if udp:
+        udp.stop()
@@ -0,0 +1,207 @@
+"""キー割り当て・スイッチ段階・ミキシングの設定ファイル（sbus_mapping.json）の読み込み
+
+設定は起動時に一度だけタプルの表に変換し、送信周期ごとの処理はその表をなめるだけにする
+（新しい機体構成でもコードの変更は不要）
+"""
+import json
+import os
+
+from sbus_protocol import NUM_CHANNELS, CHANNEL_MASK
+
+DEFAULT_MAPPING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sbus_mapping.json')
+
+
+def _channel_index(entry, section):
+    """設定の "channel"（1始まり）を control のインデックスに変換"""
+    ch = entry.get('channel')
+    if not isinstance(ch, int) or not 1 <= ch <= NUM_CHANNELS:
+        raise ValueError(f"{section}: channel must be 1-{NUM_CHANNELS} (got {ch!r})")
+    return ch - 1
+
+
+def _value(value, section):
+    if not isinstance(value, (int, float)) or not 0 <= value <= CHANNEL_MASK:
+        raise ValueError(f"{section}: value must be 0-{CHANNEL_MASK} (got {value!r})")
+    return int(value)
+
+
+class InputMapper:
+    """キー入力 → チャンネル値の変換とミキシング"""
+
+    def __init__(self, config):
+        channels = config.get('channels', [])
+        if len(channels) != NUM_CHANNELS:
+            raise ValueError(f"channels: {NUM_CHANNELS} entries required (got {len(channels)})")
+        self.names = tuple(c.get('name', '') for c in channels)
+        self.defaults = tuple(_value(c.get('default', 1000), 'channels') for c in channels)
+
+        # (増加キー, 減少キー, ch, 変化量, 最小, 最大)
+        self.axes = tuple(
+            (a['increase'], a['decrease'], _channel_index(a, 'axes'), int(a.get('step', 10)),
+             _value(a.get('min', 0), 'axes'), _value(a.get('max', CHANNEL_MASK), 'axes'))
+            for a in config.get('axes', []))
+
+        # (キー, ch, 段階の値)  押すたびに次の段階へ
+        self.switches = tuple(
+            (s['key'], _channel_index(s, 'switches'),
+             tuple(_value(v, 'switches') for v in s['positions']))
+            for s in config.get('switches', []))
+        for key, ch, positions in self.switches:
+            if not positions:
+                raise ValueError(f"switches: key {key!r} has no positions")
+
+        # (キー, ch, 値)  押すとその値にする（離しても戻らない）
+        self.presets = tuple(
+            (p['key'], _channel_index(p, 'presets'), _value(p['value'], 'presets'))
+            for p in config.get('presets', []))
+
+        self.reset_key = config.get('reset_key')
+
+        # UDP入力などが途絶えたときの送信値（ミキシング後の値として扱う。省略時は初期値）
+        failsafe = config.get('failsafe', self.defaults)
+        if len(failsafe) != NUM_CHANNELS:
+            raise ValueError(f"failsafe: {NUM_CHANNELS} values required (got {len(failsafe)})")
+        self.failsafe = tuple(_value(v, 'failsafe') for v in failsafe)
+
+        # (出力ch, 中心値, ((入力ch, 重み), ...), 最小, 最大)
+        # 出力 = 中心値 + Σ 重み × (入力 - 中心値)
+        self.mixes = tuple(
+            (_channel_index(m, 'mixes'), _value(m.get('center', 1000), 'mixes'),
+             tuple((_channel_index({'channel': ch}, 'mixes'), float(w)) for ch, w in m['inputs']),
+             _value(m.get('min', 0), 'mixes'), _value(m.get('max', CHANNEL_MASK), 'mixes'))
+            for m in config.get('mixes', []))
+
+        self.switch_states = self._initial_switch_states()
+        self._pressed = set()  # トグル・リセットキーの押下状態（エッジ検出用）
+
+    @classmethod
+    def load(cls, path=DEFAULT_MAPPING_FILE):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def initial_values(self):
+        return list(self.defaults)
+
+    def _initial_switch_states(self):
+        """各スイッチの初期段階（チャンネルの初期値に一致する段階、無ければ最初の段階）"""
+        return [positions.index(self.defaults[ch]) if self.defaults[ch] in positions else 0
+                for key, ch, positions in self.switches]
+
+    def reset(self, control):
+        """全チャンネルを初期値に戻す（control はその場で書き換える）"""
+        control[:] = self.defaults
+        self.switch_states = self._initial_switch_states()
+
+    def _edge(self, key, pressed):
+        """押された瞬間だけ True"""
+        if pressed:
+            if key not in self._pressed:
+                self._pressed.add(key)
+                return True
+        else:
+            self._pressed.discard(key)
+        return False
+
+    def poll(self, control, is_pressed):
+        """キー入力を control に反映し、(変化したチャンネルのインデックス, リセットしたか) を返す
+
+        is_pressed は keyboard.is_pressed など、キー名を受け取って押下状態を返す関数
+        リセット時は全チャンネルが変化したチャンネルに含まれる
+        """
+        changed = []
+
+        for inc, dec, ch, step, lo, hi in self.axes:
+            if is_pressed(inc):
+                if control[ch] < hi:
+                    control[ch] = min(control[ch] + step, hi)
+                    changed.append(ch)
+            elif is_pressed(dec):
+                if control[ch] > lo:
+                    control[ch] = max(control[ch] - step, lo)
+                    changed.append(ch)
+
+        for i, (key, ch, positions) in enumerate(self.switches):
+            if self._edge(key, is_pressed(key)):
+                self.switch_states[i] = (self.switch_states[i] + 1) % len(positions)
+                control[ch] = positions[self.switch_states[i]]
+                changed.append(ch)
+
+        for key, ch, value in self.presets:
+            if is_pressed(key) and control[ch] != value:
+                control[ch] = value
+                changed.append(ch)
+
+        reset = bool(self.reset_key) and self._edge(self.reset_key, is_pressed(self.reset_key))
+        if reset:
+            self.reset(control)
+            changed.extend(range(NUM_CHANNELS))
+
+        return changed, reset
+
+    def mix(self, control):
+        """ミキシング後の送信値（ミキシングが無ければ control をそのまま返す）"""
+        if not self.mixes:
+            return control
+        out = list(control)
+        for ch, center, inputs, lo, hi in self.mixes:
+            value = center
+            for src, weight in inputs:
+                value += weight * (control[src] - center)
+            out[ch] = max(lo, min(hi, int(round(value))))
+        return out
+
+    def output(self, control, failsafe=False):
+        """送信値（フェイルセーフ中はミキシングせず failsafe の値をそのまま使う）"""
+        if failsafe:
+            return self.failsafe
+        return self.mix(control)
+
+    def channel_label(self, ch):
+        """GUI・コンソール表示用のチャンネル名（例: "CH5  投下装置 (Key:0)"）"""
+        keys = [f"{inc.upper()}/{dec.upper()}" for inc, dec, c, *_ in self.axes if c == ch]
+        keys += [key for key, c, _ in self.switches if c == ch]
+        keys += [key.upper() for key, c, _ in self.presets if c == ch]
+        label = f"CH{ch + 1:<3d}{self.names[ch]}"
+        if keys:
+            label += f" (Key:{'/'.join(keys)})"
+        return label
+
+    def guide_text(self):
+        """操作ガイドの本文（設定ファイルの内容から生成）"""
+        lines = ["", "操作ガイド", "━━━━━━━━━━━━━━━━━━━━━━━━━━", ""]
+
+        if self.axes:
+            lines.append("【プロポスティック操作】")
+            for inc, dec, ch, step, lo, hi in self.axes:
+                lines.append(f"  {self.names[ch] or '（未割り当）'} (CH{ch + 1}) : "
+                             f"{inc.upper()} / {dec.upper()} キー ({lo}～{hi})")
+            lines.append("")
+
+        if self.presets:
+            lines.append("【切り替え操作】")
+            for key, ch, value in self.presets:
+                lines.append(f"  {self.names[ch] or '（未割り当）'} (CH{ch + 1}) : "
+                             f"{key.upper()} キー ({value})")
+            lines.append("")
+
+        if self.switches:
+            lines.append("【段階切り替え】")
+            for key, ch, positions in self.switches:
+                lines.append(f"  {self.names[ch] or '（未割り当）'} (CH{ch + 1}) : "
+                             f"{key} キー ({'/'.join(str(v) for v in positions)})")
+            lines.append("")
+
+        if self.mixes:
+            lines.append("【ミキシング】")
+            for ch, center, inputs, lo, hi in self.mixes:
+                terms = ' + '.join(f"{w:g}×CH{src + 1}" for src, w in inputs)
+                lines.append(f"  CH{ch + 1} = {terms}")
+            lines.append("")
+
+        if self.reset_key:
+            lines.append("【その他】")
+            lines.append(f"  リセット      : {self.reset_key} キー (すべて初期値)")
+            lines.append("")
+
+        lines.append("各プログレスバーはリアルタイムで値を表示します。")
+        return '\n'.join(lines) + '\n'
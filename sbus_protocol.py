@@ -0,0 +1,85 @@
+"""SBUSフレームの定数とデコード処理（各スクリプト共通）"""
+
+# フレーム構成
+FRAME_LENGTH = 25
+HEADER = 0x0F
+FOOTER = 0x00
+NUM_CHANNELS = 16
+CHANNEL_BITS = 11
+CHANNEL_MASK = 0x07FF
+
+# フラグバイト（data[23]）のビット割り当て
+FLAG_CH17 = 0x01
+FLAG_CH18 = 0x02
+FLAG_FRAME_LOST = 0x04
+FLAG_FAILSAFE = 0x08
+
+
+def decode_frame(data):
+    """25バイトのSBUSフレームを (16チャンネル, フラグバイト) にデコード
+
+    ヘッダー/フッターが一致しない場合は None を返す
+    """
+    if len(data) < FRAME_LENGTH or data[0] != HEADER or data[24] != FOOTER:
+        return None
+
+    # data[1]～data[22] をリトルエンディアンの176ビット整数として扱い、11ビットずつ切り出す
+    bits = int.from_bytes(bytes(data[1:23]), 'little')
+    channels = [(bits >> (CHANNEL_BITS * i)) & CHANNEL_MASK for i in range(NUM_CHANNELS)]
+    return channels, data[23]
+
+
+def encode_frame(channels, flags=0x00):
+    """16チャンネル値とフラグバイトから25バイトのSBUSフレームを生成"""
+    bits = 0
+    for i, value in enumerate(channels[:NUM_CHANNELS]):
+        bits |= (int(value) & CHANNEL_MASK) << (CHANNEL_BITS * i)
+    return bytes((HEADER,)) + bits.to_bytes(22, 'little') + bytes((flags & 0xFF, FOOTER))
+
+
+def bits_per_byte(bytesize=8, parity='N', stopbits=1):
+    """UARTで1バイト送るのに必要なビット数（スタート + データ + パリティ + ストップ）"""
+    return 1 + bytesize + (0 if parity == 'N' else 1) + stopbits
+
+
+def frame_airtime(baudrate, bytesize=8, parity='N', stopbits=1):
+    """1フレームの送信にかかる時間[s]（100000baud 8E2 で 3ms）"""
+    return FRAME_LENGTH * bits_per_byte(bytesize, parity, stopbits) / baudrate
+
+
+class FrameParser:
+    """受信したバイト列からSBUSフレームを切り出す
+
+    途中から受信した場合やバイト欠け・ノイズがあっても、ヘッダー/フッターの位置で再同期する
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.synced = False
+        self.frames = 0
+        self.discarded = 0  # 再同期のために捨てたバイト数
+
+    def feed(self, data):
+        """data を追加し、完成したフレームを (channels, flags) のリストで返す"""
+        self.buffer += data
+        frames = []
+        buf = self.buffer
+        while len(buf) >= FRAME_LENGTH:
+            if buf[0] == HEADER and buf[FRAME_LENGTH - 1] == FOOTER:
+                if not self.synced:
+                    # 同期前はデータ中の 0x0F と区別するため、次のフレームのヘッダーも確認する
+                    if len(buf) == FRAME_LENGTH:
+                        break
+                    self.synced = buf[FRAME_LENGTH] == HEADER
+                if self.synced:
+                    frames.append(decode_frame(buf[:FRAME_LENGTH]))
+                    del buf[:FRAME_LENGTH]
+                    continue
+            # 次のヘッダー候補まで読み飛ばす
+            self.synced = False
+            idx = buf.find(HEADER, 1)
+            skip = idx if idx > 0 else len(buf)
+            del buf[:skip]
+            self.discarded += skip
+        self.frames += len(frames)
+        return frames
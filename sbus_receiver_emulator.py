@@ -0,0 +1,248 @@
+"""ソフトウェアSBUS受信機エミュレーター（Linux専用・擬似端末を使用）
+
+実機なしで sbus_controller.py / main.py / sbus_monitor.py を試験するため、
+1つ以上の仮想受信機を擬似端末（/dev/pts/N）として用意する
+
+モード:
+  receiver : コントローラーから送られたフレームを受信・デコードし、
+             フライトコントローラーのようにテキストでチャンネル値を返す（main.py の Text Output に表示）
+  source   : 受信機の出力としてSBUSフレームを送り続ける（sbus_monitor.py の入力）
+
+障害の注入（受信機に入るバイト列 / source では送り出すバイト列に適用）:
+  --drop   1バイトごとの欠落確率
+  --flip   1バイトごとのビット反転確率
+  --noise  読み書き1回ごとのノイズ混入確率（--noise-len バイトのランダムデータ）
+  --loss-every / --loss-for  平均 loss-every 秒ごとに loss-for 秒の通信断
+
+使い方:
+  python sbus_receiver_emulator.py --links 4 --drop 0.001 --flip 0.001
+  python sbus_receiver_emulator.py --mode source --links 20 --loss-every 5 --loss-for 0.5
+表示された /dev/pts/N を各スクリプトの SERIAL_PORT に指定する
+"""
+import argparse
+import os
+import random
+import selectors
+import time
+import tty
+
+from sbus_protocol import FrameParser, encode_frame, FLAG_FRAME_LOST, FLAG_FAILSAFE, NUM_CHANNELS
+
+FAILSAFE_TIMEOUT = 0.1  # この時間正しいフレームが来なければフェイルセーフ[s]
+
+
+class FaultInjector:
+    """UARTの障害を模擬してバイト列を加工する"""
+
+    def __init__(self, rng, drop=0.0, flip=0.0, noise=0.0, noise_len=8,
+                 loss_every=0.0, loss_for=0.0):
+        self.rng = rng
+        self.drop = drop
+        self.flip = flip
+        self.noise = noise
+        self.noise_len = noise_len
+        self.loss_every = loss_every
+        self.loss_for = loss_for
+
+        self._loss_start = self._next_loss(time.monotonic())
+        self.dropped = 0
+        self.flipped = 0
+        self.noise_bytes = 0
+        self.losses = 0
+        self.in_loss = False
+
+    def _next_loss(self, now):
+        if self.loss_every <= 0 or self.loss_for <= 0:
+            return float('inf')
+        return now + self.rng.expovariate(1.0 / self.loss_every)
+
+    def link_lost(self, now):
+        """通信断の期間中なら True"""
+        if now >= self._loss_start + self.loss_for:
+            self._loss_start = self._next_loss(now)
+        lost = now >= self._loss_start
+        if lost and not self.in_loss:
+            self.losses += 1
+        self.in_loss = lost
+        return lost
+
+    def apply(self, data, now):
+        if self.link_lost(now):
+            self.dropped += len(data)
+            return b''
+        if not (self.drop or self.flip or self.noise):
+            return data
+
+        rand = self.rng.random
+        out = bytearray()
+        for b in data:
+            if self.drop and rand() < self.drop:
+                self.dropped += 1
+                continue
+            if self.flip and rand() < self.flip:
+                b ^= 1 << self.rng.randrange(8)
+                self.flipped += 1
+            out.append(b)
+        if self.noise and rand() < self.noise:
+            pos = self.rng.randrange(len(out) + 1)
+            out[pos:pos] = self.rng.randbytes(self.noise_len)
+            self.noise_bytes += self.noise_len
+        return bytes(out)
+
+
+class VirtualReceiver:
+    """擬似端末1本分の仮想受信機"""
+
+    def __init__(self, index, mode, faults, telemetry_rate, period):
+        self.index = index
+        self.mode = mode
+        self.faults = faults
+        self.master, self.slave = os.openpty()
+        # 改行変換やエコーをせず、バイト列をそのまま通す
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.name = os.ttyname(self.slave)
+
+        self.parser = FrameParser()
+        self.channels = [1000] * NUM_CHANNELS
+        self.flags = 0
+        self.failsafe = True
+        self.failsafe_events = 0
+        self.last_frame = 0.0
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.overruns = 0  # 相手が読まずに出力できなかった回数
+        self.telemetry_interval = 1.0 / telemetry_rate if telemetry_rate > 0 else None
+        self.period = period
+        self.next_output = time.monotonic()
+        self._phase = faults.rng.random()
+
+    def fileno(self):
+        return self.master
+
+    def on_readable(self, now):
+        try:
+            data = os.read(self.master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        self.bytes_in += len(data)
+        if self.mode != 'receiver':
+            return  # source モードでは受信データを捨てる
+
+        for channels, flags in self.parser.feed(self.faults.apply(data, now)):
+            self.channels = channels
+            self.flags = flags
+            self.last_frame = now
+
+    def update_failsafe(self, now):
+        failsafe = (now - self.last_frame > FAILSAFE_TIMEOUT) or bool(self.flags & FLAG_FAILSAFE)
+        if failsafe and not self.failsafe:
+            self.failsafe_events += 1
+        self.failsafe = failsafe
+
+    def _write(self, data):
+        try:
+            self.bytes_out += os.write(self.master, data)
+        except (BlockingIOError, OSError):
+            self.overruns += 1
+
+    def on_tick(self, now):
+        """送信周期ごとの処理（テレメトリ送信 / フレーム送信）"""
+        if self.mode == 'receiver':
+            self.update_failsafe(now)
+            if self.telemetry_interval is None:
+                self.next_output = now + FAILSAFE_TIMEOUT
+                return
+            ch = self.channels
+            line = (f"RX{self.index} CH1:{ch[0]} CH2:{ch[1]} CH3:{ch[2]} CH4:{ch[3]} "
+                    f"FS:{int(self.failsafe)} OK:{self.parser.frames} ERR:{self.parser.discarded}\r\n")
+            self._write(line.encode())
+            self.next_output = now + self.telemetry_interval
+        else:
+            # 受信機の出力を模擬: スティックをゆっくり動かす
+            # 送信機との通信断中は実機と同様に最後の値を保持し、フェイルセーフフラグを立てて出力を続ける
+            lost = self.faults.link_lost(now)
+            if lost:
+                if not self.failsafe:
+                    self.failsafe_events += 1
+                self._write(encode_frame(self.channels, FLAG_FRAME_LOST | FLAG_FAILSAFE))
+            else:
+                phase = (now * 0.5 + self._phase) % 1.0
+                value = int(360 + 1320 * (1.0 - abs(2.0 * phase - 1.0)))
+                self.channels = [value] * 4 + [1000] * (NUM_CHANNELS - 4)
+                self._write(self.faults.apply(encode_frame(self.channels), now))
+            self.failsafe = lost
+            self.next_output = now + self.period
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+    def stats_line(self):
+        f = self.faults
+        return (f"{self.name:<12s} in {self.bytes_in:>9d} B  frames {self.parser.frames:>8d}  "
+                f"resync {self.parser.discarded:>6d} B  failsafe {self.failsafe_events:>4d}  "
+                f"out {self.bytes_out:>9d} B  overrun {self.overruns:>5d}  "
+                f"drop {f.dropped:>6d}  flip {f.flipped:>6d}  noise {f.noise_bytes:>6d}  loss {f.losses:>4d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SBUS受信機エミュレーター（擬似端末）")
+    parser.add_argument('--links', type=int, default=1, help="仮想受信機の数")
+    parser.add_argument('--mode', choices=['receiver', 'source'], default='receiver')
+    parser.add_argument('--drop', type=float, default=0.0, help="バイト欠落確率")
+    parser.add_argument('--flip', type=float, default=0.0, help="ビット反転確率（1バイトあたり）")
+    parser.add_argument('--noise', type=float, default=0.0, help="ノイズ混入確率（読み書き1回あたり）")
+    parser.add_argument('--noise-len', type=int, default=8, help="ノイズのバイト数")
+    parser.add_argument('--loss-every', type=float, default=0.0, help="通信断の平均間隔[s]（0: なし）")
+    parser.add_argument('--loss-for', type=float, default=0.0, help="通信断の長さ[s]")
+    parser.add_argument('--telemetry-rate', type=float, default=10.0,
+                        help="receiver: テキスト送信の頻度[Hz]（0: 送らない）")
+    parser.add_argument('--period', type=float, default=0.007,
+                        help="source: フレーム送信周期[s]")
+    parser.add_argument('--stats-interval', type=float, default=5.0, help="統計表示の間隔[s]")
+    parser.add_argument('--seed', type=int, default=None, help="障害注入の乱数シード")
+    args = parser.parse_args()
+    if args.links < 1:
+        parser.error("--links must be 1 or more")
+
+    rng = random.Random(args.seed)
+    links = []
+    for i in range(args.links):
+        faults = FaultInjector(random.Random(rng.random()), args.drop, args.flip, args.noise,
+                               args.noise_len, args.loss_every, args.loss_for)
+        links.append(VirtualReceiver(i, args.mode, faults, args.telemetry_rate, args.period))
+        print(f"link {i}: {links[-1].name}")
+
+    sel = selectors.DefaultSelector()
+    for link in links:
+        sel.register(link, selectors.EVENT_READ)
+
+    next_stats = time.monotonic() + args.stats_interval
+    try:
+        while True:
+            now = time.monotonic()
+            timeout = max(0.0, min(min(link.next_output for link in links), next_stats) - now)
+            for key, _ in sel.select(timeout):
+                key.fileobj.on_readable(time.monotonic())
+
+            now = time.monotonic()
+            for link in links:
+                if now >= link.next_output:
+                    link.on_tick(now)
+            if now >= next_stats:
+                print(f"--- {time.strftime('%H:%M:%S')} ---")
+                for link in links:
+                    print(link.stats_line())
+                next_stats = now + args.stats_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for link in links:
+            sel.unregister(link)
+            link.close()
+
+
+if __name__ == "__main__":
+    main()
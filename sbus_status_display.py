@@ -0,0 +1,89 @@
+"""コンソール用のステータス表示（別スレッドで一定周期に画面を書き換える）
+
+送信ループは値を書き換えるだけで print しないため、端末の出力待ちで送信周期が延びない
+"""
+import os
+import sys
+import threading
+import time
+import unicodedata
+
+
+def _pad(text, width):
+    """全角文字を2桁として width 桁に揃える"""
+    out = ''
+    used = 0
+    for char in text:
+        w = 2 if unicodedata.east_asian_width(char) in 'WF' else 1
+        if used + w > width:
+            break
+        out += char
+        used += w
+    return out + ' ' * (width - used)
+
+
+class StatusDisplay:
+    """全チャンネル・スイッチ状態・送信統計をその場で再描画する"""
+
+    def __init__(self, mapper, control, tx, rate=20.0, stream=None, udp=None):
+        self.mapper = mapper
+        self.control = control
+        self.tx = tx
+        self.udp = udp
+        self.labels = [_pad(mapper.channel_label(i), 32) for i in range(len(mapper.defaults))]
+        self.interval = 1.0 / rate
+        self.stream = stream or sys.stdout
+        self.message = ""  # 最後の操作（チャンネル値の変更・リセット）
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if os.name == 'nt':
+            # Windowsコンソールでエスケープシーケンスを有効にする
+            os.system('')
+        self.stream.write('\x1b[2J\x1b[?25l')  # 画面クリア・カーソル非表示
+        self.stream.flush()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+        self.stream.write('\x1b[?25h\n')
+        self.stream.flush()
+
+    def render(self):
+        """表示内容（1画面分の文字列）"""
+        channels = self.mapper.output(self.control, self.udp is not None and not self.udp.active)
+        lines = ["SBUS Controller"]
+        lines.append("-" * 60)
+        for i, value in enumerate(channels):
+            # 0-2047 を40文字のバーで表示
+            bar = '#' * (value * 40 // 2048)
+            lines.append(f"{self.labels[i]} {value:5d} |{bar:<40s}|")
+        lines.append("-" * 60)
+
+        switches = '  '.join(f"{key}:{state + 1}" for (key, _, _), state
+                             in zip(self.mapper.switches, self.mapper.switch_states))
+        lines.append(f"Switches: {switches}")
+        lines.append(self.tx.format_stats())
+        if self.udp:
+            lines.append(self.udp.format_stats())
+        lines.append(self.message)
+        # 前回より短い行の残りを消す
+        return '\x1b[H' + '\n'.join(line + '\x1b[K' for line in lines)
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while self._running:
+            # 1回の write で1画面分を書き込む
+            self.stream.write(self.render())
+            self.stream.flush()
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()
@@ -0,0 +1,158 @@
+"""回線速度を考慮したSBUSフレーム送信（バックプレッシャー付き）"""
+import time
+
+import serial
+
+from sbus_protocol import FRAME_LENGTH, bits_per_byte
+
+
+class SBUSTransmitter:
+    """SBUSフレームの送信と遅延・破棄数の計測
+
+    ボーレート/パリティ/ストップビットから1フレームの送信時間を計算し、
+    送信周期をそれより短くしない。送信バッファに前のフレームが溜まっている間は
+    新しいフレームを積まずに破棄する（次の周期で最新の値を送り直すため、
+    古い値が遅れて受信機に届くことはない）
+
+    ポートの設定は変更しない。書き込みで送信ループが止まらないよう、
+    ポートは write_timeout（2フレーム分程度）を指定して開いておくこと
+    """
+
+    def __init__(self, ser, period=0.002, max_backlog_frames=1):
+        self.ser = ser
+        self.byte_time = bits_per_byte(ser.bytesize, ser.parity, ser.stopbits) / ser.baudrate
+        self.frame_time = FRAME_LENGTH * self.byte_time
+        self.period = max(period, self.frame_time)
+        self.max_backlog = max_backlog_frames * FRAME_LENGTH
+
+        self._wire_free_at = 0.0  # 送信済みフレームが回線から出終わる推定時刻
+        self._next_tick = time.perf_counter()
+
+        self.sent = 0
+        self.dropped = 0  # 回線が詰まっていて書き込まなかったフレーム（受信機には何も届かない）
+        # 書き込みがタイムアウトしたフレーム。途中まで送信バッファに入り、欠けたフレームが
+        # 回線に出た可能性がある（受信機は次のヘッダーで再同期するまで取りこぼす）
+        self.write_timeouts = 0
+        # 送信遅延: send() の呼び出しから回線に出終わるまで（バッファ待ち + 送信時間）
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._latency_sum = 0.0
+        # 入力遅延: 入力を受け取ってから、その値を含むフレームが回線に出終わるまで
+        self.input_count = 0
+        self.last_input_latency = 0.0
+        self.max_input_latency = 0.0
+        self._input_latency_sum = 0.0
+        self._pending_stamp = None  # まだ送れていない入力の時刻（最も古いもの）
+
+    @property
+    def max_rate(self):
+        """設定された回線で送れる最大フレームレート[Hz]"""
+        return 1.0 / self.frame_time
+
+    def backlog(self, now=None):
+        """送信待ちのバイト数
+
+        OSが返す出力バッファ量と、これまでの送信時刻からの推定値の大きい方
+        """
+        if now is None:
+            now = time.perf_counter()
+        estimated = max(0.0, self._wire_free_at - now) / self.byte_time
+        try:
+            queued = self.ser.out_waiting
+        except (AttributeError, NotImplementedError, serial.SerialException):
+            queued = 0
+        return max(queued, int(estimated))
+
+    def send(self, frame, stamp=None):
+        """フレームを送信（回線が詰まっている場合・書き込みがタイムアウトした場合は False を返す）
+
+        stamp には入力を受け取った時刻（time.perf_counter）を渡すと、
+        そこから回線に出終わるまでを入力遅延として記録する。フレームを破棄した場合は
+        その時刻を保持し、次に送れたフレームで計測する
+        """
+        if stamp is not None and self._pending_stamp is None:
+            self._pending_stamp = stamp
+        now = time.perf_counter()
+        backlog = self.backlog(now)
+        if backlog >= self.max_backlog:
+            self.dropped += 1
+            return False
+
+        try:
+            self.ser.write(frame)
+        except serial.SerialTimeoutException:
+            # どこまで書けたかは分からないので、フレーム全体が送信待ちになったとみなす
+            self.write_timeouts += 1
+            self._wire_free_at = now + (backlog + len(frame)) * self.byte_time
+            return False
+
+        done = now + (backlog + len(frame)) * self.byte_time
+        self._wire_free_at = done
+        latency = done - now
+        self.sent += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self._latency_sum += latency
+
+        if self._pending_stamp is not None:
+            latency = done - self._pending_stamp
+            self._pending_stamp = None
+            self.input_count += 1
+            self.last_input_latency = latency
+            self.max_input_latency = max(self.max_input_latency, latency)
+            self._input_latency_sum += latency
+        return True
+
+    def wait_next_period(self, wake=None):
+        """次の送信時刻まで待つ（sleep後の処理時間で周期がずれないよう絶対時刻で管理）
+
+        wake（threading.Event / multiprocessing.Event）を渡すと、セットされた時点で待つのをやめる
+        （新しい入力を次の周期を待たずに送るため。送信周期はそこから数え直す）
+        """
+        self._next_tick += self.period
+        delay = self._next_tick - time.perf_counter()
+        if wake is not None:
+            if wake.wait(max(delay, 0.0)):
+                wake.clear()
+                self._next_tick = time.perf_counter()
+                return
+        elif delay > 0:
+            time.sleep(delay)
+        if delay < -self.period:
+            # 大きく遅れた場合は追いつこうとせず、現在時刻から数え直す
+            self._next_tick = time.perf_counter()
+
+    def stats(self):
+        """送信統計（遅延は秒）"""
+        return {
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'write_timeouts': self.write_timeouts,
+            'last_latency': self.last_latency,
+            'max_latency': self.max_latency,
+            'mean_latency': self._latency_sum / self.sent if self.sent else 0.0,
+            'input_count': self.input_count,
+            'last_input_latency': self.last_input_latency,
+            'max_input_latency': self.max_input_latency,
+            'mean_input_latency': (self._input_latency_sum / self.input_count
+                                   if self.input_count else 0.0),
+            'max_rate': self.max_rate,
+            'period': self.period,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"TX {s['sent']} sent / {s['dropped']} dropped / {s['write_timeouts']} timeout | "
+                f"{format_latency(s)} | "
+                f"{1.0 / s['period']:.0f} Hz (max {s['max_rate']:.0f} Hz)")
+
+
+def format_latency(s):
+    """stats() の遅延部分の表示（入力遅延は計測した場合のみ）"""
+    text = (f"wire {s['last_latency'] * 1000:.2f} ms "
+            f"(mean {s['mean_latency'] * 1000:.2f}, max {s['max_latency'] * 1000:.2f})")
+    if s['input_count']:
+        text = (f"input {s['last_input_latency'] * 1000:.2f} ms "
+                f"(mean {s['mean_input_latency'] * 1000:.2f}, "
+                f"max {s['max_input_latency'] * 1000:.2f}) | " + text)
+    return text
@@ -0,0 +1,209 @@
+"""SBUS送信ループを専用の子プロセスで実行する
+
+GUI（Tkのメインループ）やキーボード監視とGILを共有しないため、
+ウィンドウのドラッグや大量のログ表示中でも送信周期が乱れない
+
+UIプロセス → 送信プロセス : 共有メモリのチャンネル値（シーケンス番号で読み書きの衝突を検出）
+送信プロセス → UIプロセス : 共有メモリの送信統計、受信バイト列と起動時のエラーは Queue
+"""
+import gc
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+from sbus_protocol import NUM_CHANNELS, encode_frame, frame_airtime
+from sbus_transmitter import SBUSTransmitter, format_latency
+
+# 先頭の TX_STAT_KEYS は SBUSTransmitter.stats() の値をそのまま写す
+TX_STAT_KEYS = ('sent', 'dropped', 'write_timeouts', 'last_latency', 'max_latency',
+                'mean_latency', 'input_count', 'last_input_latency', 'max_input_latency',
+                'mean_input_latency')
+STAT_KEYS = TX_STAT_KEYS + ('max_rate', 'period', 'last_interval', 'max_jitter')
+
+
+def _set_affinity(cpu):
+    """送信プロセスを指定CPUに固定"""
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, {cpu})
+        else:
+            import psutil
+            psutil.Process().cpu_affinity([cpu])
+    except ImportError:
+        print("TX process: CPU affinity needs psutil on this platform")
+    except (OSError, ValueError) as e:
+        print(f"TX process: could not pin to CPU {cpu}: {e}")
+
+
+def _raise_priority():
+    """権限があれば送信プロセスの優先度を上げる（なければ通常優先度のまま）"""
+    try:
+        if hasattr(os, 'sched_setscheduler'):
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(10))
+            return
+    except PermissionError:
+        pass
+    try:
+        import psutil
+        if sys.platform == 'win32':
+            psutil.Process().nice(psutil.HIGH_PRIORITY_CLASS)
+        else:
+            psutil.Process().nice(-10)
+        return
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"TX process: could not raise priority: {e}")
+        return
+    try:
+        os.nice(-10)
+    except (AttributeError, PermissionError) as e:
+        print(f"TX process: could not raise priority: {e}")
+
+
+def _tx_main(port, baudrate, parity, stopbits, period, cpu, realtime,
+             channels, seq, stamp, wake, stats, rx_queue, error_queue, stop_event):
+    """子プロセス側: チャンネル値を読み、エンコードして送信する"""
+    import serial
+
+    if cpu is not None:
+        _set_affinity(cpu)
+    if realtime:
+        _raise_priority()
+
+    try:
+        ser = serial.Serial(port, baudrate, parity=parity, stopbits=stopbits, timeout=0,
+                            write_timeout=2 * frame_airtime(baudrate, 8, parity, stopbits))
+    except Exception as e:
+        # ポートを開けなかったことをUIプロセスに伝えて終了
+        error_queue.put(str(e))
+        return
+    tx = SBUSTransmitter(ser, period=period)
+    stats[STAT_KEYS.index('period')] = tx.period
+    stats[STAT_KEYS.index('max_rate')] = tx.max_rate
+
+    # ループ内の確保はごくわずかなので、GCによる停止を避ける
+    gc.disable()
+
+    values = [0] * NUM_CHANNELS
+    last_seq = -1
+    last_send = None
+    max_jitter = 0.0
+    try:
+        while not stop_event.is_set():
+            # 書き込み中（奇数）や読み取り中に更新された場合は前回の値を使う
+            input_stamp = None
+            s1 = seq.value
+            if s1 & 1 == 0 and s1 != last_seq:
+                snapshot = channels[:]
+                t = stamp.value
+                if seq.value == s1:
+                    values = snapshot
+                    last_seq = s1
+                    # 新しい値を初めて送るフレームだけ入力からの遅延を計測
+                    input_stamp = t or None
+
+            tx.send(encode_frame(values), input_stamp)
+
+            now = time.perf_counter()
+            if last_send is not None:
+                interval = now - last_send
+                max_jitter = max(max_jitter, abs(interval - tx.period))
+                stats[STAT_KEYS.index('last_interval')] = interval
+            last_send = now
+
+            if ser.in_waiting:
+                rx_queue.put(ser.read(ser.in_waiting))
+
+            tx_stats = tx.stats()
+            for i, key in enumerate(TX_STAT_KEYS):
+                stats[i] = tx_stats[key]
+            stats[STAT_KEYS.index('max_jitter')] = max_jitter
+
+            # 時刻付きの入力（UDP）が来たら周期を待たずに送る
+            tx.wait_next_period(wake)
+    finally:
+        ser.close()
+
+
+class TxProcess:
+    """送信プロセスの起動・チャンネル値の受け渡し・統計の取得"""
+
+    def __init__(self, port, baudrate, parity, stopbits, period=0.002, cpu=None, realtime=False):
+        # Tkを読み込んだプロセスをforkしないよう spawn を使う（Windowsと同じ動作）
+        ctx = multiprocessing.get_context('spawn')
+        self.channels = ctx.Array('H', NUM_CHANNELS, lock=False)
+        self.seq = ctx.Value('L', 0, lock=False)
+        self.stamp = ctx.Value('d', 0.0, lock=False)
+        self.wake = ctx.Event()
+        self.stats = ctx.Array('d', len(STAT_KEYS), lock=False)
+        self.rx_queue = ctx.Queue()
+        self.error_queue = ctx.Queue()
+        self.stop_event = ctx.Event()
+        self.process = ctx.Process(
+            target=_tx_main, daemon=True,
+            args=(port, baudrate, parity, stopbits, period, cpu, realtime,
+                  self.channels, self.seq, self.stamp, self.wake, self.stats,
+                  self.rx_queue, self.error_queue, self.stop_event))
+
+    def start(self):
+        self.process.start()
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def error(self):
+        """送信プロセスが停止していればその理由（動作中は None）"""
+        if self.process.is_alive() or self.stop_event.is_set():
+            return None
+        try:
+            return self.error_queue.get(timeout=0.1)
+        except queue.Empty:
+            if self.process.exitcode is None:
+                return None  # まだ起動していない
+            return f"TX process exited (code {self.process.exitcode})"
+
+    def update(self, control, stamp=None):
+        """チャンネル値を送信プロセスに渡す
+
+        stamp は入力時刻（time.perf_counter）。None または 0 の場合は遅延を計測しない
+        stamp がある場合は送信プロセスを起こし、次の周期を待たずに送らせる
+        値が変わらず stamp も無い場合は何もしない（送信プロセスがまだ読んでいない入力時刻を消さない）
+        """
+        values = list(control[:NUM_CHANNELS])
+        if not stamp and self.channels[:] == values:
+            return
+        self.seq.value += 1  # 奇数: 書き込み中
+        self.channels[:] = values
+        self.stamp.value = stamp or 0.0
+        self.seq.value += 1
+        if stamp:
+            self.wake.set()
+
+    def receive(self, timeout=0.01):
+        """送信プロセスが受信したバイト列（なければ b''）"""
+        try:
+            return self.rx_queue.get(timeout=timeout)
+        except queue.Empty:
+            return b''
+
+    def read_stats(self):
+        return dict(zip(STAT_KEYS, self.stats[:]))
+
+    def format_stats(self):
+        s = self.read_stats()
+        if not s['period']:
+            return "TX process: starting..."
+        return (f"TX(proc) {int(s['sent'])} sent / {int(s['dropped'])} dropped / "
+                f"{int(s['write_timeouts'])} timeout | "
+                f"{format_latency(s)} | "
+                f"interval {s['last_interval'] * 1000:.2f} ms (jitter max {s['max_jitter'] * 1000:.2f}) | "
+                f"{1.0 / s['period']:.0f} Hz (max {s['max_rate']:.0f} Hz)")
+
+    def stop(self, timeout=1.0):
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,191 @@
+"""UDPでチャンネル値を受け取る（地上局ソフト・SITLシミュレーターとの連携用）
+
+パケット形式（リトルエンディアン, 40バイト）:
+  magic   2s   b'SB'
+  version u8   1
+  flags   u8   予約（0）
+  seq     u32  送信ごとに1増やす（古いパケット・重複は破棄）
+  ch1-16  u16  0～2047
+
+受信スレッドは溜まっているパケットをまとめて読み、最新の1つだけを残す（古い値は送らない）
+送信ループは送信周期ごとに apply() で最新値を取り込む。一定時間受信がなければフェイルセーフ状態
+（active = False）になり、送信側は InputMapper.output() でミキシング後の値を failsafe に置き換える
+
+動作確認:
+  python sbus_udp_input.py --rate 200   # 127.0.0.1 にスイープ信号を送る
+"""
+import argparse
+import math
+import socket
+import struct
+import threading
+import time
+
+from sbus_protocol import NUM_CHANNELS, CHANNEL_MASK
+
+PACKET = struct.Struct('<2sBBI16H')
+MAGIC = b'SB'
+VERSION = 1
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 14600
+
+
+def pack_packet(seq, channels, flags=0):
+    return PACKET.pack(MAGIC, VERSION, flags, seq & 0xFFFFFFFF, *channels[:NUM_CHANNELS])
+
+
+def unpack_packet(data):
+    """パケットを (seq, channels) に変換（不正なパケットは None）"""
+    if len(data) != PACKET.size:
+        return None
+    magic, version, flags, seq, *channels = PACKET.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        return None
+    if max(channels) > CHANNEL_MASK:
+        return None
+    return seq, channels
+
+
+class UDPChannelInput:
+    """UDPで受け取ったチャンネル値を送信ループに渡す"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=0.2, on_packet=None):
+        self.timeout = timeout
+        # 新しいパケットを受け取るたびに受信スレッドから呼ぶ関数（引数なし）
+        # 送信ループの周期を待たずに値を渡す場合に使う（main.py の送信プロセス）
+        self.on_packet = on_packet
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.1)  # 停止フラグを確認するため
+
+        # (seq, channels, 受信時刻) を丸ごと差し替える（GILにより参照の代入は不可分）
+        self._latest = None
+        self._consumed_seq = None
+        self._last_seq = None
+        self.active = False
+
+        self.received = 0
+        self.invalid = 0
+        self.out_of_order = 0
+        self.coalesced = 0  # 新しいパケットに上書きされて使われなかった数
+        self.failsafe_events = 0
+        self.last_pickup = 0.0  # 受信から送信ループが取り込むまで[s]
+        self.max_pickup = 0.0
+
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+        self.sock.close()
+
+    def _accept(self, data, now):
+        """パケットを検証し、採用するなら True"""
+        self.received += 1
+        packet = unpack_packet(data)
+        if packet is None:
+            self.invalid += 1
+            return False
+        seq, channels = packet
+
+        latest = self._latest
+        stale = latest is None or now - latest[2] > self.timeout
+        # seq は32bitで一周するので差分で比較（途絶後は送信側の再起動とみなして受け入れる）
+        if self._last_seq is not None and not stale:
+            diff = (seq - self._last_seq) & 0xFFFFFFFF
+            if diff == 0 or diff >= 0x80000000:
+                self.out_of_order += 1
+                return False
+        self._last_seq = seq
+        if latest is not None and latest[0] != self._consumed_seq:
+            self.coalesced += 1
+        self._latest = (seq, channels, now)
+        return True
+
+    def _run(self):
+        while self._running:
+            try:
+                data = self.sock.recv(PACKET.size + 1)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            accepted = self._accept(data, time.perf_counter())
+
+            # 溜まっている分をまとめて読み、最新だけを残す
+            self.sock.setblocking(False)
+            try:
+                while True:
+                    accepted |= self._accept(self.sock.recv(PACKET.size + 1), time.perf_counter())
+            except (BlockingIOError, OSError):
+                pass
+            finally:
+                self.sock.settimeout(0.1)
+
+            if accepted and self.on_packet:
+                self.on_packet()
+
+    def apply(self, control, now=None):
+        """最新の値を control に書き込む
+
+        新しいパケットを初めて取り込んだときはその受信時刻（遅延計測用）を、それ以外は None を返す
+        一定時間受信がない場合は control を変更せず、active を False にする
+        """
+        if now is None:
+            now = time.perf_counter()
+        latest = self._latest
+        if latest is None or now - latest[2] > self.timeout:
+            if self.active:
+                self.failsafe_events += 1
+            self.active = False
+            return None
+
+        self.active = True
+        seq, channels, stamp = latest
+        control[:] = channels
+        if seq == self._consumed_seq:
+            return None
+        self._consumed_seq = seq
+        self.last_pickup = now - stamp
+        self.max_pickup = max(self.max_pickup, self.last_pickup)
+        return stamp
+
+    def format_stats(self):
+        state = "active" if self.active else "FAILSAFE"
+        return (f"UDP {state} | {self.received} rx / {self.invalid} invalid / "
+                f"{self.out_of_order} old / {self.coalesced} coalesced | "
+                f"pickup {self.last_pickup * 1000:.2f} ms (max {self.max_pickup * 1000:.2f}) | "
+                f"failsafe {self.failsafe_events}")
+
+
+def main():
+    """テスト用の送信側: 127.0.0.1 にスティックのスイープを送る"""
+    parser = argparse.ArgumentParser(description="UDPチャンネルパケットのテスト送信")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--rate', type=float, default=100.0, help="送信頻度[Hz]")
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    interval = 1.0 / args.rate
+    seq = 0
+    start = next_tick = time.perf_counter()
+    while True:
+        t = time.perf_counter() - start
+        stick = int(1020 + 660 * math.sin(2 * math.pi * 0.25 * t))
+        channels = [stick] * 4 + [1000] * (NUM_CHANNELS - 4)
+        sock.sendto(pack_packet(seq, channels), (args.host, args.port))
+        seq += 1
+        next_tick += interval
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+
+if __name__ == "__main__":
+    main()